@@ -1,27 +1,79 @@
+from io import StringIO
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 import pandas as pd
 from api.models import FuelData
 
+# Mapping from CSV column names to FuelData field names
+COLUMN_MAPPING = {
+    'OPIS Truckstop ID': 'opis_truckstop_id',
+    'Truckstop Name': 'truckstop_name',
+    'Address': 'address',
+    'City': 'city',
+    'State': 'state',
+    'Rack ID': 'rack_id',
+    'Retail Price': 'retail_price',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+}
+
+# Explicit column types so pandas skips type inference
+COLUMN_DTYPES = {
+    'OPIS Truckstop ID': str,
+    'Truckstop Name': str,
+    'Address': str,
+    'City': str,
+    'State': str,
+    'Rack ID': str,
+    'Retail Price': 'float64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+}
+
+# Number of CSV rows parsed and inserted at a time
+CHUNK_SIZE = 5000
+
 class Command(BaseCommand):
     help = 'Populate FuelData from a CSV file'
 
     def handle(self, *args, **kwargs):
-        # Load the CSV data
+        # Stream the CSV data in chunks, parsing only the model columns
         CSV_FILE_PATH = 'data/fuel_prices_processed.csv'
-        df = pd.read_csv(CSV_FILE_PATH)
-
-        # Iterate over the rows in the DataFrame and create FuelData objects
-        for _, row in df.iterrows():
-            FuelData.objects.create(
-                opis_truckstop_id=row['OPIS Truckstop ID'],
-                truckstop_name=row['Truckstop Name'],
-                address=row['Address'],
-                city=row['City'],
-                state=row['State'],
-                rack_id=row['Rack ID'],
-                retail_price=row['Retail Price'],
-                latitude=row['latitude'],
-                longitude=row['longitude']
-            )
-
-        self.stdout.write(self.style.SUCCESS('Successfully populated FuelData from CSV.')) 
\ No newline at end of file
+        chunks = pd.read_csv(CSV_FILE_PATH, usecols=list(COLUMN_MAPPING), dtype=COLUMN_DTYPES, chunksize=CHUNK_SIZE)
+
+        total_rows = 0
+        with transaction.atomic():
+            for df in chunks:
+                # Order the columns like the mapping and rename them to the FuelData field names
+                df = df[list(COLUMN_MAPPING)].rename(columns=COLUMN_MAPPING)
+
+                # Prices are stored in cents precision
+                df['retail_price'] = df['retail_price'].round(2)
+
+                if connection.vendor == 'postgresql':
+                    self.copy_rows(df)
+                else:
+                    self.bulk_create_rows(df)
+                total_rows += len(df)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully populated {total_rows} FuelData rows from CSV.'))
+
+    def copy_rows(self, df):
+        """
+        Stream the rows into the FuelData table with PostgreSQL's COPY.
+        """
+        buf = StringIO()
+        df.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+
+        table = connection.ops.quote_name(FuelData._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(column) for column in df.columns)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH CSV', buf)
+
+    def bulk_create_rows(self, df):
+        """
+        Insert the rows in batches for backends without COPY support.
+        """
+        objs = [FuelData(**row._asdict()) for row in df.itertuples(index=False)]
+        FuelData.objects.bulk_create(objs, batch_size=1000)
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.23 on 2026-10-15 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fueldata',
+            name='retail_price',
+            field=models.FloatField(),
+        ),
+    ]
@@ -9,7 +9,7 @@ class FuelData(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     rack_id = models.CharField(max_length=100)
-    retail_price = models.DecimalField(max_digits=5, decimal_places=2)
+    retail_price = models.FloatField()
     latitude = models.FloatField()
     longitude = models.FloatField()
 
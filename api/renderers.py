@@ -0,0 +1,25 @@
+"""
+Renderers for the API responses.
+"""
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson.
+
+    Types orjson does not handle natively (Decimal, lazy strings, ...) fall back
+    to DRF's JSON encoder.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render the data into JSON bytes.
+        """
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=JSONEncoder().default, option=orjson.OPT_SERIALIZE_NUMPY)
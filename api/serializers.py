@@ -52,7 +52,7 @@ class FuelStopSerializer(serializers.Serializer):
     Serializer for fuel stop data.
     """
     name = serializers.CharField()
-    price = serializers.DecimalField(max_digits=5, decimal_places=2)
+    price = serializers.FloatField()
     location = LocationSerializer()
     city = serializers.CharField(required=False)
     state = serializers.CharField(required=False)
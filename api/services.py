@@ -0,0 +1,95 @@
+"""
+Route calculation services shared by the API views.
+"""
+import logging
+from functools import lru_cache
+from typing import Dict, Any
+from utils.routing import RoutingService
+from utils.fuel_optimization import FuelOptimizer
+from utils.map_generator import MapGenerator
+from utils.geocoding import GeocodingService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Services are created on first use and shared by all requests in the process
+@lru_cache(maxsize=1)
+def get_routing_service() -> RoutingService:
+    """
+    Get the shared routing service.
+    """
+    return RoutingService()
+
+@lru_cache(maxsize=1)
+def get_fuel_optimizer() -> FuelOptimizer:
+    """
+    Get the shared fuel optimizer.
+    """
+    return FuelOptimizer()
+
+@lru_cache(maxsize=1)
+def get_map_generator() -> MapGenerator:
+    """
+    Get the shared map generator.
+    """
+    return MapGenerator()
+
+@lru_cache(maxsize=1)
+def get_geocoding_service() -> GeocodingService:
+    """
+    Get the shared geocoding service.
+    """
+    return GeocodingService()
+
+def compute_route_and_fuel(start: Dict[str, float], finish: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Calculate a route with optimized fuel stops and generate its map.
+
+    Args:
+        start: Dictionary with 'lat' and 'lng' keys for the starting point.
+        finish: Dictionary with 'lat' and 'lng' keys for the ending point.
+
+    Returns:
+        Dictionary with 'route' and 'fuel' response sections and the generated 'map_id'.
+
+    Raises:
+        ValueError: If the route cannot be calculated.
+    """
+    routing_service = get_routing_service()
+    fuel_optimizer = get_fuel_optimizer()
+
+    # Get the route
+    route_data = routing_service.get_route(start, finish)
+
+    # Extract route info
+    route_info = routing_service.extract_route_info(route_data)
+
+    # Calculate fuel stops
+    fuel_stops, total_cost, checked_points = fuel_optimizer.optimize_fuel_stops(
+        route_info['distance'],
+        route_info['steps'],
+        route_info['coordinate_array']
+    )
+
+    # Generate the map
+    map_id, map_file = get_map_generator().generate_map(
+        route_data,
+        fuel_stops,
+        checked_points,
+        search_radius=fuel_optimizer.search_radius,
+        route_geometry=route_info['coordinate_array']
+    )
+
+    return {
+        'route': {
+            'distance': route_info['distance'],
+            'duration': route_info['duration'],
+            'unit': 'miles'
+        },
+        'fuel': {
+            'stops': fuel_stops,
+            'total_cost': total_cost,
+            'mpg': fuel_optimizer.miles_per_gallon
+        },
+        'map_id': map_id
+    }
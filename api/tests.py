@@ -0,0 +1,272 @@
+"""
+Tests for the route optimizer API.
+"""
+import gzip
+import os
+import random
+import re
+import tempfile
+import time
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from geopy.distance import geodesic
+from utils.fuel_optimization import FuelOptimizer, cheapest_within_radius
+from api.services import get_geocoding_service
+from utils.geocoding import GeocodingService
+from utils.map_generator import MapGenerator
+
+# Search settings used by FuelOptimizer by default
+SEARCH_RADIUS = 15.0
+BUFFER_DEGREES = SEARCH_RADIUS / 69
+
+def sorted_stations(stations):
+    """
+    Build latitude-sorted station arrays from (latitude, longitude, price) tuples.
+    """
+    stations = sorted(stations)
+    return tuple(np.array([station[i] for station in stations], dtype=np.float64) for i in range(3))
+
+class CheapestWithinRadiusTests(SimpleTestCase):
+    """
+    Tests for the vectorized fuel station selection.
+    """
+    def select(self, check_points, stations):
+        check_array = np.asarray(check_points, dtype=np.float64).reshape(-1, 2)
+        lats, lngs, prices = sorted_stations(stations)
+        best_idx, best_dist = cheapest_within_radius(
+            check_array[:, 0], check_array[:, 1], lats, lngs, prices, BUFFER_DEGREES, SEARCH_RADIUS
+        )
+        return best_idx.tolist(), best_dist.tolist(), (lats, lngs, prices)
+
+    def test_no_stations(self):
+        best_idx, best_dist, _ = self.select([(40.0, -90.0), (41.0, -91.0)], [])
+        self.assertEqual(best_idx, [-1, -1])
+        self.assertEqual(best_dist, [np.inf, np.inf])
+
+    def test_check_point_without_candidates(self):
+        # The second check point has no station within its latitude band,
+        # the third one only has a station inside the band but outside the radius
+        best_idx, best_dist, (lats, _, _) = self.select(
+            [(40.0, -90.0), (45.0, -90.0), (35.0, -90.0)],
+            [(40.01, -90.01, 3.5), (35.0, -89.75, 3.0)]
+        )
+        self.assertEqual(lats[best_idx[0]], 40.01)
+        self.assertEqual(best_idx[1:], [-1, -1])
+        self.assertLess(best_dist[0], 1.0)
+        self.assertEqual(best_dist[1:], [np.inf, np.inf])
+
+    def test_price_tie_is_broken_by_distance(self):
+        best_idx, best_dist, (lats, lngs, prices) = self.select(
+            [(40.0, -90.0)],
+            [(40.1, -90.0, 3.25), (40.02, -90.0, 3.25), (40.05, -90.0, 3.50)]
+        )
+        self.assertEqual((lats[best_idx[0]], prices[best_idx[0]]), (40.02, 3.25))
+        self.assertAlmostEqual(best_dist[0], geodesic((40.0, -90.0), (40.02, -90.0)).miles, places=2)
+
+    def test_cheapest_station_wins_over_nearest(self):
+        best_idx, _, (lats, _, _) = self.select(
+            [(40.0, -90.0)],
+            [(40.01, -90.0, 3.90), (40.15, -90.0, 3.10)]
+        )
+        self.assertEqual(lats[best_idx[0]], 40.15)
+
+    def test_check_points_sharing_a_station(self):
+        best_idx, best_dist, (lats, _, _) = self.select(
+            [(40.0, -90.0), (40.05, -90.05), (40.1, -90.0)],
+            [(40.05, -90.0, 3.0), (40.0, -90.01, 3.5), (43.0, -90.0, 1.0)]
+        )
+        self.assertEqual(len(set(best_idx)), 1)
+        self.assertEqual(lats[best_idx[0]], 40.05)
+        self.assertEqual(len(best_dist), 3)
+
+    def test_matches_brute_force_geodesic_selection(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            center_lat, center_lng = rng.uniform(26, 48), rng.uniform(-124, -68)
+            check_points = [
+                (center_lat + rng.uniform(-2, 2), center_lng + rng.uniform(-2, 2))
+                for _ in range(rng.randint(1, 15))
+            ]
+            stations = [
+                (center_lat + rng.uniform(-2.3, 2.3), center_lng + rng.uniform(-2.3, 2.3), rng.uniform(2.5, 5.0))
+                for _ in range(rng.randint(0, 400))
+            ]
+            best_idx, _, (lats, lngs, prices) = self.select(check_points, stations)
+
+            # Reference: the original per-station loop, with its rectangular pre-filter and geodesic distances
+            for check_point, station_idx in zip(check_points, best_idx):
+                candidates = []
+                for i in range(lats.size):
+                    if abs(lats[i] - check_point[0]) > BUFFER_DEGREES or abs(lngs[i] - check_point[1]) > BUFFER_DEGREES:
+                        continue
+                    distance = geodesic(check_point, (lats[i], lngs[i])).miles
+                    if distance <= SEARCH_RADIUS:
+                        candidates.append((prices[i], distance, i))
+                expected = min(candidates)[2] if candidates else -1
+                self.assertEqual(station_idx, expected)
+
+class CalculateCheckPointsTests(SimpleTestCase):
+    """
+    Tests for placing check points along the route steps.
+    """
+    def check_points(self, distances):
+        # Step i ends at way point i + 1, whose coordinates are [lng=i + 1, lat=i + 1.5]
+        steps = [{'distance': distance, 'way_points': [i, i + 1]} for i, distance in enumerate(distances)]
+        geometry = [[float(i), i + 0.5] for i in range(len(distances) + 1)]
+        return FuelOptimizer(segment_distance=400.0).calculate_check_points(sum(distances), steps, geometry)
+
+    def at_steps(self, *step_indices):
+        return [(i + 1.5, float(i + 1)) for i in step_indices]
+
+    def test_no_steps(self):
+        self.assertEqual(self.check_points([]), [])
+
+    def test_overshoot_is_dropped_at_each_check_point(self):
+        # 600 miles after the second step; the count restarts from there instead of carrying 200 over
+        self.assertEqual(self.check_points([300, 300, 300, 50]), self.at_steps(1, 3))
+        self.assertEqual(self.check_points([300, 300, 300, 150]), self.at_steps(1, 3))
+        self.assertEqual(self.check_points([300, 300, 399, 1]), self.at_steps(1, 3))
+
+    def test_boundary_reached_exactly(self):
+        self.assertEqual(self.check_points([200, 200, 400]), self.at_steps(1, 2))
+
+    def test_tail_just_over_half_a_segment(self):
+        self.assertEqual(self.check_points([400, 200.5]), self.at_steps(0, 1))
+
+    def test_tail_just_under_half_a_segment(self):
+        self.assertEqual(self.check_points([400, 199.5]), self.at_steps(0))
+        self.assertEqual(self.check_points([400, 200]), self.at_steps(0))
+
+    def test_short_route_has_only_a_tail_check_point(self):
+        self.assertEqual(self.check_points([150, 100]), self.at_steps(1))
+        self.assertEqual(self.check_points([150, 40]), [])
+
+    def test_step_longer_than_two_segments(self):
+        # A single step only yields one check point, then the count restarts after it
+        self.assertEqual(self.check_points([100, 900, 100]), self.at_steps(1))
+        self.assertEqual(self.check_points([100, 900, 250]), self.at_steps(1, 2))
+        self.assertEqual(self.check_points([1000]), self.at_steps(0))
+
+class MapGeneratorTests(SimpleTestCase):
+    """
+    Tests for the generated map HTML.
+    """
+    def setUp(self):
+        self.map_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.map_dir.cleanup)
+        self.route = {'features': [{'geometry': {'coordinates': [[-90.0 + i * 0.1, 40.0] for i in range(50)]}}]}
+        self.checked_points = [(40.0, -89.5), (40.0, -88.5), (40.0, -87.5), (40.0, -86.5)]
+        self.fuel_stops = [
+            {
+                'name': f'STATION {i}',
+                'price': 3.0 + i / 10,
+                'location': {'lat': 40.01, 'lng': lng + 0.01},
+                'city': 'Springfield',
+                'state': 'IL',
+                'distance_from_route': 0.9
+            }
+            for i, (_, lng) in enumerate(self.checked_points[:3])
+        ]
+
+    def generate(self):
+        return MapGenerator(map_dir=self.map_dir.name).generate_map(
+            self.route, self.fuel_stops, self.checked_points, search_radius=SEARCH_RADIUS
+        )
+
+    def test_map_contains_every_marker(self):
+        _, map_file = self.generate()
+        with open(map_file, encoding='utf-8') as f:
+            html = f.read()
+
+        # The check point script runs after the map variable is defined
+        map_definition = re.search(r'var (map_\w+) = L\.map\(', html)
+        self.assertIsNotNone(map_definition)
+        map_name = map_definition.group(1)
+        script = html[map_definition.end():]
+        self.assertEqual(script.count('L.circleMarker('), len(self.checked_points))
+        self.assertEqual(script.count('L.circle('), len(self.checked_points))
+        for call in re.findall(r'L\.circle(?:Marker)?\(.*', script):
+            self.assertTrue(call.endswith(f'.addTo({map_name});'), call)
+        for lat, lng in self.checked_points:
+            self.assertIn(f'L.circleMarker([{lat}, {lng}]', script)
+            self.assertIn(f'L.circle([{lat}, {lng}], {{"radius":{SEARCH_RADIUS * 1609.34}', script)
+
+        # Fuel stops are drawn from one GeoJSON layer with a feature per stop
+        self.assertEqual(html.count('"type": "Feature"'), len(self.fuel_stops))
+        for stop in self.fuel_stops:
+            self.assertIn(f'"tooltip": "{stop["name"]} - ${stop["price"]:.2f}"', html)
+
+    def test_map_without_fuel_stops_or_check_points(self):
+        # Routes shorter than half a segment have neither
+        self.fuel_stops = []
+        self.checked_points = []
+        _, map_file = self.generate()
+        with open(map_file, encoding='utf-8') as f:
+            html = f.read()
+        self.assertIn('L.polyline(', html)
+        self.assertNotIn('L.circleMarker(', html)
+        self.assertNotIn('"type": "Feature"', html)
+
+    def test_map_with_check_points_but_no_fuel_stops(self):
+        # No station was found within the search radius of any check point
+        self.fuel_stops = []
+        _, map_file = self.generate()
+        with open(map_file, encoding='utf-8') as f:
+            html = f.read()
+        self.assertEqual(html.count('L.circleMarker('), len(self.checked_points))
+        self.assertNotIn('"type": "Feature"', html)
+
+    def test_identical_maps_are_reused(self):
+        map_id, map_file = self.generate()
+        mtime = os.path.getmtime(map_file)
+        self.assertEqual(self.generate(), (map_id, map_file))
+        self.assertEqual(os.path.getmtime(map_file), mtime)
+
+        # The pre-compressed copy holds the same HTML
+        with open(map_file, 'rb') as f, gzip.open(f'{map_file}.gz', 'rb') as gz:
+            self.assertEqual(gz.read(), f.read())
+
+class GeocodingRateLimitTests(SimpleTestCase):
+    """
+    Tests for spacing out the geocoding requests.
+    """
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_requests_are_spaced_across_calls_and_batches(self):
+        service = GeocodingService(max_workers=4, min_request_interval=0.05)
+        request_times = []
+
+        def fake_get(url, params, timeout):
+            request_times.append(time.monotonic())
+            return mock.Mock(json=mock.Mock(return_value=[{'lat': '40.0', 'lon': '-90.0'}]))
+
+        with mock.patch.object(service.session, 'get', side_effect=fake_get):
+            service.geocode('Springfield, IL')
+            service.batch_geocode(['Chicago, IL', 'Peoria, IL', 'Decatur, IL'])
+            service.batch_geocode(['Joliet, IL', 'Chicago, IL'])
+
+        self.assertEqual(len(request_times), 5)
+        request_times.sort()
+        for previous, current in zip(request_times, request_times[1:]):
+            self.assertGreaterEqual(current - previous, 0.045)
+
+class RouteByNameTests(SimpleTestCase):
+    """
+    Tests for the route-by-name endpoint.
+    """
+    def test_finish_location_is_not_geocoded_when_start_fails(self):
+        with mock.patch.object(get_geocoding_service(), 'geocode', return_value=None) as geocode:
+            response = self.client.post(
+                '/api/route-by-name/',
+                {'start_location': 'Nowhere, ZZ', 'finish_location': 'Chicago, IL'},
+                content_type='application/json',
+                secure=True
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start location', response.json()['error'])
+        geocode.assert_called_once_with('Nowhere, ZZ')
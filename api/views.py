@@ -1,10 +1,13 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
 import json
-import os
 import logging
+from functools import lru_cache
+from pathlib import Path
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
@@ -14,10 +17,7 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import FuelData
-from utils.routing import RoutingService
-from utils.fuel_optimization import FuelOptimizer
-from utils.map_generator import MapGenerator
-from utils.geocoding import GeocodingService
+from .services import compute_route_and_fuel, get_geocoding_service, get_map_generator
 from .serializers import (
     FuelDataSerializer, 
     RouteRequestSerializer, 
@@ -29,11 +29,27 @@ from .serializers import (
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize services
-routing_service = RoutingService()
-fuel_optimizer = FuelOptimizer()
-map_generator = MapGenerator()
-geocoding_service = GeocodingService()
+@lru_cache(maxsize=1024)
+def get_map_path(map_id):
+    """
+    Resolve the file of a generated map.
+    
+    Existing maps are remembered so repeated requests skip the filesystem check.
+    Missing maps raise instead of returning, so they are never cached.
+    
+    Args:
+        map_id: Unique ID of the map.
+        
+    Returns:
+        Path to the map HTML file.
+        
+    Raises:
+        Http404: If the map with the given ID is not found.
+    """
+    map_file = Path(get_map_generator().map_dir) / f'{map_id}.html'
+    if not map_file.is_file():
+        raise Http404("Map not found")
+    return map_file
 
 # Swagger parameters
 fuel_prices_params = [
@@ -113,13 +129,13 @@ def fuel_prices(request):
         # Get the limit from the request parameters
         limit = int(request.GET.get('limit', 10))  # Default limit is 10
         
-        # Query the database
-        fuel_data = FuelData.objects.all()[:limit]
-        
-        # Serialize the data
-        serializer = FuelDataSerializer(fuel_data, many=True)
+        # Query the database, fetching plain dicts instead of model instances
+        fuel_data = FuelData.objects.values(
+            'id', 'opis_truckstop_id', 'truckstop_name', 'address', 'city',
+            'state', 'rack_id', 'retail_price', 'latitude', 'longitude'
+        )[:limit]
         
-        return Response(serializer.data)
+        return Response(list(fuel_data))
     except Exception as e:
         logger.error(f"Error fetching fuel prices: {str(e)}")
         return Response(
@@ -178,33 +194,15 @@ def route(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get the route
+        # Calculate the route, fuel stops and map
         try:
-            route_data = routing_service.get_route(start, finish)
+            result = compute_route_and_fuel(start, finish)
         except ValueError as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Extract route info
-        route_info = routing_service.extract_route_info(route_data)
-        
-        # Calculate fuel stops
-        fuel_stops, total_cost, checked_points = fuel_optimizer.optimize_fuel_stops(
-            route_info['distance'],
-            route_info['steps'],
-            route_info['coordinates']
-        )
-        
-        # Generate the map
-        map_id, map_file = map_generator.generate_map(
-            route_data,
-            fuel_stops,
-            checked_points,
-            search_radius=fuel_optimizer.search_radius
-        )
-        
         # Get the host from the request
         host = request.get_host()
         scheme = request.scheme  # This will be 'http' or 'https'
@@ -212,17 +210,9 @@ def route(request):
         # Prepare the response
         response_data = {
             'message': 'Route data fetched successfully.',
-            'route': {
-                'distance': route_info['distance'],
-                'duration': route_info['duration'],
-                'unit': 'miles'
-            },
-            'fuel': {
-                'stops': fuel_stops,
-                'total_cost': total_cost,
-                'mpg': fuel_optimizer.miles_per_gallon
-            },
-            'map_url': f'{scheme}://{host}/api/map/{map_id}/'
+            'route': result['route'],
+            'fuel': result['fuel'],
+            'map_url': f'{scheme}://{host}/api/map/{result["map_id"]}/'
         }
         
         return Response(response_data)
@@ -277,18 +267,38 @@ def show_map(request, map_id):
     Raises:
         Http404: If the map with the given ID is not found.
     """
-    # Path to the map file
-    map_file = os.path.join(map_generator.map_dir, f'{map_id}.html')
+    # Path to the map file (raises Http404 if it does not exist)
+    map_file = get_map_path(map_id)
     
-    # Check if the file exists
-    if not os.path.exists(map_file):
-        raise Http404("Map not found")
+    # Let Nginx stream the file when it is configured to serve the maps directory
+    if settings.MAP_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type='text/html')
+        response['X-Accel-Redirect'] = f"{settings.MAP_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{map_id}.html"
+        return response
     
-    # Read the file
-    with open(map_file, 'r') as f:
-        map_html = f.read()
+    # Stream the pre-compressed copy to clients that accept gzip
+    gz_file = map_file.with_name(f'{map_file.name}.gz')
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '') and gz_file.is_file():
+        response = FileResponse(gz_file.open('rb'))
+        # FileResponse derives the headers from the file name, which would describe a gzip download
+        response['Content-Type'] = 'text/html; charset=utf-8'
+        response['Content-Encoding'] = 'gzip'
+        del response['Content-Disposition']
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
     
-    return HttpResponse(map_html)
+    # Stream the file
+    try:
+        map_stream = map_file.open('rb')
+    except FileNotFoundError:
+        # The map was removed after its path was cached
+        get_map_path.cache_clear()
+        raise Http404("Map not found")
+    
+    response = FileResponse(map_stream)
+    response['Content-Type'] = 'text/html; charset=utf-8'
+    del response['Content-Disposition']
+    return response
 
 @swagger_auto_schema(
     method='post',
@@ -334,6 +344,8 @@ def route_by_name(request):
             )
         
         # Geocode the locations
+        geocoding_service = get_geocoding_service()
+        
         logger.info(f"Geocoding start location: {start_location}")
         start_coords = geocoding_service.geocode(start_location)
         if not start_coords:
@@ -350,33 +362,15 @@ def route_by_name(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get the route
+        # Calculate the route, fuel stops and map
         try:
-            route_data = routing_service.get_route(start_coords, finish_coords)
+            result = compute_route_and_fuel(start_coords, finish_coords)
         except ValueError as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Extract route info
-        route_info = routing_service.extract_route_info(route_data)
-        
-        # Calculate fuel stops
-        fuel_stops, total_cost, checked_points = fuel_optimizer.optimize_fuel_stops(
-            route_info['distance'],
-            route_info['steps'],
-            route_info['coordinates']
-        )
-        
-        # Generate the map
-        map_id, map_file = map_generator.generate_map(
-            route_data,
-            fuel_stops,
-            checked_points,
-            search_radius=fuel_optimizer.search_radius
-        )
-        
         # Get the host from the request
         host = request.get_host()
         scheme = request.scheme  # This will be 'http' or 'https'
@@ -394,17 +388,9 @@ def route_by_name(request):
                     'coordinates': finish_coords
                 }
             },
-            'route': {
-                'distance': route_info['distance'],
-                'duration': route_info['duration'],
-                'unit': 'miles'
-            },
-            'fuel': {
-                'stops': fuel_stops,
-                'total_cost': total_cost,
-                'mpg': fuel_optimizer.miles_per_gallon
-            },
-            'map_url': f'{scheme}://{host}/api/map/{map_id}/'
+            'route': result['route'],
+            'fuel': result['fuel'],
+            'map_url': f'{scheme}://{host}/api/map/{result["map_id"]}/'
         }
         
         return Response(response_data)
@@ -137,6 +137,10 @@ CACHES = {
 # API Keys
 OPENROUTE_API_KEY = os.environ.get('OPENROUTE_API_KEY', '5b3ce3597851110001cf6248959ff6952ecb49009f4659ea7558a739')
 
+# Internal Nginx location that serves generated maps (e.g. '/protected-maps/').
+# When set, map files are handed off to Nginx with X-Accel-Redirect instead of being read by Django.
+MAP_ACCEL_REDIRECT_PREFIX = os.environ.get('MAP_ACCEL_REDIRECT_PREFIX', '')
+
 # Security settings
 if not DEBUG:
     # HTTPS settings
@@ -156,6 +160,10 @@ if not DEBUG:
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
 import googlemaps
 from time import sleep
+from concurrent.futures import ThreadPoolExecutor
 import folium
 from folium import plugins
 import webbrowser
@@ -13,13 +15,27 @@ home_dir = str(Path.home())
 temp_dir = os.path.join(home_dir, 'fuel_prices_temp')
 os.makedirs(temp_dir, exist_ok=True)
 
-# Initialize Google Maps client
-gmaps = googlemaps.Client(key='google-maps-key')
+# Initialize Google Maps client (the client throttles requests to stay within the quota)
+gmaps = googlemaps.Client(key='google-maps-key', queries_per_second=50)
+
+# Number of geocoding requests to run concurrently
+GEOCODING_WORKERS = 10
+
+# Store numbers (e.g. "#796") removed from business names before geocoding
+STORE_NUMBER_PATTERN = re.compile(r'#\d+')
 
 # Read the CSV file from the original location
 current_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(current_dir, 'data', 'fuel-prices-for-be-assessment.csv')
-df = pd.read_csv(csv_path)
+df = pd.read_csv(csv_path, dtype={
+    'OPIS Truckstop ID': 'int64',
+    'Truckstop Name': str,
+    'Address': str,
+    'City': str,
+    'State': str,
+    'Rack ID': 'int64',
+    'Retail Price': 'float64',
+})
 
 # Display initial dataset info
 print("\nInitial Dataset Info:")
@@ -57,44 +73,22 @@ os.makedirs(os.path.join(current_dir, 'data'), exist_ok=True)
 # Try to load existing processed data
 if os.path.exists(processed_file):
     print(f"\nLoading existing processed data from {processed_file}...")
-    existing_data = pd.read_csv(processed_file)
-    # Create a dictionary of existing coordinates
-    existing_coords = existing_data.set_index('OPIS Truckstop ID')[['latitude', 'longitude', 'cleaned_name']].to_dict('index')
+    existing_data = pd.read_csv(
+        processed_file,
+        usecols=['OPIS Truckstop ID', 'latitude', 'longitude', 'cleaned_name'],
+        dtype={'OPIS Truckstop ID': 'int64', 'latitude': 'float64', 'longitude': 'float64', 'cleaned_name': str}
+    )
+    # Index the existing coordinates by OPIS Truckstop ID
+    existing_coords = existing_data.set_index('OPIS Truckstop ID')[['latitude', 'longitude', 'cleaned_name']]
     print(f"Found {len(existing_coords)} existing locations")
 else:
     print(f"\nNo existing processed data found. Will create new file at {processed_file}")
-    existing_coords = {}
-
-def clean_business_name(name):
-    # Remove only numbers that come after #
-    name = re.sub(r'#\d+', '', name)
-    return name.strip()
+    existing_coords = pd.DataFrame(columns=['latitude', 'longitude', 'cleaned_name']).astype({'latitude': float, 'longitude': float})
 
-# Function to get coordinates for an address
-def get_coordinates(row):
+# Function to get coordinates for a search query
+def get_coordinates(search_query):
     try:
-        # Check if we already have coordinates for this location
-        if row['OPIS Truckstop ID'] in existing_coords:
-            existing = existing_coords[row['OPIS Truckstop ID']]
-            print(f"\nUsing existing coordinates for {row['Truckstop Name']}")
-            return pd.Series({
-                'latitude': existing['latitude'],
-                'longitude': existing['longitude'],
-                'geocoding_query': None,  # We don't have the original query
-                'cleaned_name': existing['cleaned_name'],
-                'is_new_geocoding': False
-            })
-
-        # If not, proceed with geocoding
-        truckstop_name = clean_business_name(row['Truckstop Name'])
-        city = row['City'].strip()
-        state = row['State'].strip()
-        
-        search_query = f"{truckstop_name}, {city}, {state}, USA"
-        
         print(f"\nProcessing new location: {search_query}")
-        print(f"Original name: {row['Truckstop Name']}")
-        print(f"Cleaned name: {truckstop_name}")
         
         result = gmaps.geocode(search_query)
         
@@ -102,42 +96,60 @@ def get_coordinates(row):
             location = result[0]['geometry']['location']
             print(f"Successfully geocoded: {search_query}")
             print(f"Coordinates: {location['lat']}, {location['lng']}")
-            return pd.Series({
-                'latitude': location['lat'], 
-                'longitude': location['lng'],
-                'geocoding_query': search_query,
-                'cleaned_name': truckstop_name,
-                'is_new_geocoding': True
-            })
+            return location['lat'], location['lng']
         else:
             print(f"No results found for: {search_query}")
-            return pd.Series({
-                'latitude': None, 
-                'longitude': None,
-                'geocoding_query': None,
-                'cleaned_name': truckstop_name,
-                'is_new_geocoding': True
-            })
+            return None, None
             
     except Exception as e:
-        print(f"Error geocoding: {search_query if 'search_query' in locals() else ''}")
+        print(f"Error geocoding: {search_query}")
         print(f"Error message: {str(e)}")
-        return pd.Series({
-            'latitude': None, 
-            'longitude': None,
-            'geocoding_query': None,
-            'cleaned_name': truckstop_name if 'truckstop_name' in locals() else None,
-            'is_new_geocoding': True
-        })
+        return None, None
     # finally:
-    #     # Sleep to respect API rate limits (only for new geocoding)
-    #     if 'is_new_geocoding' not in locals() or is_new_geocoding:
-    #         sleep(0.1)
+    #     # Sleep to respect API rate limits
+    #     sleep(0.1)
 
 # Process the data
 print("\nProcessing locations...")
-df_test = df_grouped.copy()  # Process all rows instead of just head(50)
-df_test[['latitude', 'longitude', 'geocoding_query', 'cleaned_name', 'is_new_geocoding']] = df_test.apply(get_coordinates, axis=1)
+df_test = df_grouped  # Process all rows in place; the new columns are assigned column-wise below
+
+# Split rows into already geocoded and new locations
+is_new = ~df_test['OPIS Truckstop ID'].isin(existing_coords.index)
+
+# Fill the existing coordinates for all already geocoded rows in one lookup
+cached = existing_coords.reindex(df_test['OPIS Truckstop ID'])
+df_test['latitude'] = cached['latitude'].to_numpy()
+df_test['longitude'] = cached['longitude'].to_numpy()
+df_test['geocoding_query'] = None  # We don't have the original query for existing locations
+df_test['cleaned_name'] = cached['cleaned_name'].to_numpy(dtype=object)
+
+# Clean the business names of the new locations in one pass (remove only numbers that come after #)
+df_test.loc[is_new, 'cleaned_name'] = df_test.loc[is_new, 'Truckstop Name'].str.replace(STORE_NUMBER_PATTERN, '', regex=True).str.strip()
+df_test['is_new_geocoding'] = is_new
+
+# Only geocode the new locations, overlapping the requests in a thread pool
+new_rows = df_test.loc[is_new, ['cleaned_name', 'City', 'State']]
+queries = [
+    f"{truckstop_name}, {city.strip()}, {state.strip()}, USA"
+    for truckstop_name, city, state in new_rows.itertuples(index=False, name=None)
+]
+
+# Stations sharing the same (cleaned name, city, state) are geocoded only once
+unique_queries = list(dict.fromkeys(queries))
+print(f"Geocoding {len(unique_queries)} unique queries for {len(queries)} new locations")
+with ThreadPoolExecutor(max_workers=GEOCODING_WORKERS) as executor:
+    geocoded = dict(zip(unique_queries, executor.map(get_coordinates, unique_queries)))
+
+# Assign the results to the new rows column-wise in one step (failed lookups become NaN)
+new_coords = np.array([geocoded[search_query] for search_query in queries], dtype=float).reshape(-1, 2)
+df_test.loc[is_new, ['latitude', 'longitude']] = new_coords
+df_test.loc[is_new, 'geocoding_query'] = np.where(np.isnan(new_coords[:, 0]), None, queries)
+
+# Coordinates as NumPy arrays, with one mask of successful geocodes reused below
+lats = df_test['latitude'].to_numpy(dtype=float)
+lngs = df_test['longitude'].to_numpy(dtype=float)
+geocoded_mask = ~np.isnan(lats)
+geocoded_count = int(geocoded_mask.sum())
 
 # Print test results summary
 new_geocodes = df_test['is_new_geocoding'].sum()
@@ -145,50 +157,49 @@ print("\nResults:")
 print(f"Total locations processed: {len(df_test)}")
 print(f"Existing locations reused: {len(df_test) - new_geocodes}")
 print(f"New locations geocoded: {new_geocodes}")
-print(f"Successfully geocoded: {df_test['latitude'].notna().sum()} addresses")
-print(f"Failed to geocode: {df_test['latitude'].isna().sum()} addresses")
+print(f"Successfully geocoded: {geocoded_count} addresses")
+print(f"Failed to geocode: {len(df_test) - geocoded_count} addresses")
 
-# Save the complete processed dataframe
-processed_df = df_test.copy()
-processed_df['processed_date'] = pd.Timestamp.now().strftime('%Y-%m-%d')
-processed_df['geocoding_success'] = processed_df['latitude'].notna()
+# Add the processing metadata columns
+df_test['processed_date'] = pd.Timestamp.now().strftime('%Y-%m-%d')
+df_test['geocoding_success'] = geocoded_mask
 
-# Save to the main processed file
-processed_df.to_csv(processed_file, index=False)
+# Save the complete processed dataframe to the main processed file
+df_test.to_csv(processed_file, index=False)
 print(f"\nProcessed data saved to '{processed_file}'")
 
 # Create a map centered on the mean coordinates of successful geocodes
-center_lat = df_test[df_test['latitude'].notna()]['latitude'].mean()
-center_lng = df_test[df_test['latitude'].notna()]['longitude'].mean()
+center_lat = lats[geocoded_mask].mean()
+center_lng = lngs[geocoded_mask].mean()
 m = folium.Map(location=[center_lat, center_lng], zoom_start=4)
 
-# Add marker clusters to handle large number of markers efficiently
-marker_cluster = plugins.MarkerCluster().add_to(m)
-
-# Add a marker for each location
-for idx, row in df_test.iterrows():
-    if pd.notna(row['latitude']) and pd.notna(row['longitude']):  # Only add markers for successful geocodes
-        # Create popup content
-        popup_content = f"""
-        <b>{row['Truckstop Name']}</b><br>
-        <i>Cleaned name: {row['cleaned_name']}</i><br>
-        Address: {row['Address']}<br>
-        {row['City']}, {row['State']}<br>
-        <div style="background-color: #f0f0f0; padding: 5px; margin: 5px 0;">
-        <b>Coordinates:</b><br>
-        Lat: {row['latitude']:.6f}<br>
-        Lng: {row['longitude']:.6f}
-        </div>
-        Fuel Price: ${row['Retail Price']:.3f}
-        """
-        
-        # Add marker with popup
-        folium.Marker(
-            location=[row['latitude'], row['longitude']],
-            popup=folium.Popup(popup_content, max_width=300),
-            tooltip=row['cleaned_name'],
-            icon=folium.Icon(color='red', icon='info-sign')
-        ).add_to(marker_cluster)
+# Build each marker and its popup in the browser; rows are [lat, lng, name, cleaned name, address, city, state, price]
+marker_callback = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: 'red', prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    var popup = '<b>' + row[2] + '</b><br>' +
+        '<i>Cleaned name: ' + row[3] + '</i><br>' +
+        'Address: ' + row[4] + '<br>' +
+        row[5] + ', ' + row[6] + '<br>' +
+        '<div style="background-color: #f0f0f0; padding: 5px; margin: 5px 0;">' +
+        '<b>Coordinates:</b><br>' +
+        'Lat: ' + row[0].toFixed(6) + '<br>' +
+        'Lng: ' + row[1].toFixed(6) +
+        '</div>' +
+        'Fuel Price: $' + row[7].toFixed(3);
+    marker.bindPopup(popup, {maxWidth: 300});
+    marker.bindTooltip(row[3]);
+    return marker;
+}
+"""
+
+# Add all successful geocodes as a client-side rendered marker cluster
+marker_data = df_test.loc[
+    geocoded_mask,
+    ['latitude', 'longitude', 'Truckstop Name', 'cleaned_name', 'Address', 'City', 'State', 'Retail Price']
+].to_numpy().tolist()
+plugins.FastMarkerCluster(marker_data, callback=marker_callback).add_to(m)
 
 # Add a legend
 legend_html = '''
@@ -217,10 +228,10 @@ webbrowser.open('file://' + os.path.abspath(map_path))
 # Display summary of results
 print("\nSummary of results:")
 print("\nSample of successful geocodes:")
-successful = df_test[df_test['latitude'].notna()].head()
+successful = df_test[geocoded_mask].head()
 print(successful[['OPIS Truckstop ID', 'Truckstop Name', 'cleaned_name', 'City', 'State', 'Retail Price', 'latitude', 'longitude']])
 
-if df_test['latitude'].isna().any():
+if geocoded_count < len(df_test):
     print("\nSample of failed geocodes:")
-    failed = df_test[df_test['latitude'].isna()].head()
+    failed = df_test[~geocoded_mask].head()
     print(failed[['OPIS Truckstop ID', 'Truckstop Name', 'cleaned_name', 'City', 'State']]) 
\ No newline at end of file
@@ -15,10 +15,13 @@ from pprint import pprint
 # Base URL for the API
 BASE_URL = "http://localhost:8000/api"
 
+# Shared session so all requests reuse the same connection
+SESSION = requests.Session()
+
 def get_fuel_prices(limit=5):
     """Get a list of fuel prices."""
     url = f"{BASE_URL}/fuel-prices/?limit={limit}"
-    response = requests.get(url)
+    response = SESSION.get(url)
     
     if response.status_code == 200:
         print(f"Successfully retrieved {len(response.json())} fuel prices:")
@@ -35,7 +38,7 @@ def calculate_route_by_coordinates(start_lat, start_lng, finish_lat, finish_lng)
         "finish": {"lat": finish_lat, "lng": finish_lng}
     }
     
-    response = requests.post(url, json=data)
+    response = SESSION.post(url, json=data)
     
     if response.status_code == 200:
         result = response.json()
@@ -67,7 +70,7 @@ def calculate_route_by_names(start_location, finish_location):
         "finish_location": finish_location
     }
     
-    response = requests.post(url, json=data)
+    response = SESSION.post(url, json=data)
     
     if response.status_code == 200:
         result = response.json()
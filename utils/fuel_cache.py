@@ -0,0 +1,95 @@
+"""
+In-process snapshot of the fuel station data for the route optimizer API.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple, Any
+import numpy as np
+from django.db.models.signals import post_save, post_delete
+from api.models import FuelData
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Snapshot refresh interval (1 hour)
+SNAPSHOT_TIMEOUT = 60 * 60
+
+_lock = threading.Lock()
+_snapshot = None
+_loaded_at = 0.0
+
+def stations_to_arrays(rows: List[Tuple[float, float, float, int]]) -> Dict[str, np.ndarray]:
+    """
+    Convert (latitude, longitude, retail_price, id) rows into NumPy arrays.
+    
+    The stations are sorted by latitude, so the stations within a latitude
+    band can be found with a binary search (np.searchsorted).
+    
+    Args:
+        rows: List of (latitude, longitude, retail_price, id) tuples.
+        
+    Returns:
+        Dictionary with 'latitude', 'longitude', 'retail_price' and 'id' arrays.
+    """
+    lats = np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows))
+    order = np.argsort(lats, kind='stable')
+    
+    return {
+        'latitude': lats[order],
+        'longitude': np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))[order],
+        'retail_price': np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))[order],
+        'id': np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))[order]
+    }
+
+def get_station_snapshot() -> Dict[str, np.ndarray]:
+    """
+    Get the snapshot of all fuel stations, loading it on first use.
+    
+    Only the columns needed to select stations are kept; the display fields
+    of the selected stations are fetched by ID with get_station_details.
+    The snapshot is reloaded after SNAPSHOT_TIMEOUT seconds, or on the next
+    call after a FuelData row is saved or deleted in this process.
+    
+    Returns:
+        Station arrays for the whole FuelData table, as returned by stations_to_arrays.
+    """
+    global _snapshot, _loaded_at
+    
+    with _lock:
+        if _snapshot is None or time.monotonic() - _loaded_at > SNAPSHOT_TIMEOUT:
+            rows = list(FuelData.objects.values_list(
+                'latitude', 'longitude', 'retail_price', 'id'
+            ).iterator(chunk_size=2000))
+            _snapshot = stations_to_arrays(rows)
+            _loaded_at = time.monotonic()
+            logger.info(f"Loaded {len(rows)} stations into the snapshot")
+        
+        return _snapshot
+
+def get_station_details(station_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Fetch the display fields of the given stations.
+    
+    Args:
+        station_ids: IDs of the stations.
+        
+    Returns:
+        Dictionary mapping station ID to its 'truckstop_name', 'city' and 'state'.
+    """
+    return {
+        station['id']: station
+        for station in FuelData.objects.filter(id__in=station_ids).values('id', 'truckstop_name', 'city', 'state')
+    }
+
+def invalidate_station_snapshot(**kwargs):
+    """
+    Drop the snapshot so it is reloaded on next use.
+    """
+    global _snapshot
+    
+    with _lock:
+        _snapshot = None
+
+post_save.connect(invalidate_station_snapshot, sender=FuelData, dispatch_uid='fuel_cache_post_save')
+post_delete.connect(invalidate_station_snapshot, sender=FuelData, dispatch_uid='fuel_cache_post_delete')
@@ -3,15 +3,109 @@ Fuel optimization utility functions for the route optimizer API.
 """
 import logging
 from typing import Dict, List, Tuple, Any
+import numpy as np
 from geopy.distance import geodesic
-from django.core.cache import cache
-from api.models import FuelData
+from utils.fuel_cache import get_station_snapshot, get_station_details, stations_to_arrays
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Cache timeout (1 hour)
-CACHE_TIMEOUT = 60 * 60
+# Mean Earth radius in miles
+EARTH_RADIUS_MILES = 3958.8
+
+# Relative error bound of equirectangular_miles against the geodesic distance at search radius scale.
+# Pairs whose approximate distance is within this margin of the radius are re-measured with geodesic.
+APPROXIMATION_MARGIN = 0.005
+
+def equirectangular_miles(lat, lng, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Approximate the distances from origin points to an array of points.
+    
+    Uses a spherical equirectangular projection around the origin, which only
+    needs one cosine per origin. Compared with the geodesic distance on the
+    WGS-84 ellipsoid it is off by up to about 0.4% at the search radius scale
+    in the continental US, so it is only suited to pre-filtering and ranking.
+    
+    Args:
+        lat: Latitude of the origin point(s) in degrees, a scalar or an array matching lats.
+        lng: Longitude of the origin point(s) in degrees, a scalar or an array matching lngs.
+        lats: Array of latitudes in degrees.
+        lngs: Array of longitudes in degrees.
+        
+    Returns:
+        Array of distances in miles.
+    """
+    dlat = np.radians(lats - lat)
+    dlng = np.radians(lngs - lng) * np.cos(np.radians(lat))
+    return EARTH_RADIUS_MILES * np.sqrt(dlat * dlat + dlng * dlng)
+
+def cheapest_within_radius(check_lats: np.ndarray, check_lngs: np.ndarray, lats: np.ndarray, lngs: np.ndarray,
+                           prices: np.ndarray, buffer_degrees: float, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the cheapest station within the radius of every check point in one vectorized pass.
+    
+    Candidate (check point, station) pairs for all check points are gathered
+    together, so the filtering, distance and selection steps each run once
+    over a single array instead of once per check point.
+    
+    Pairs are pre-filtered with equirectangular_miles. Pairs close enough to
+    the radius for the approximation to matter are re-measured with geopy's
+    geodesic, so the radius cut matches the geodesic distance exactly.
+    
+    Args:
+        check_lats: Array of check point latitudes.
+        check_lngs: Array of check point longitudes.
+        lats: Array of station latitudes, sorted ascending.
+        lngs: Array of station longitudes.
+        prices: Array of station prices.
+        buffer_degrees: Half-size in degrees of the rectangular pre-filter around each check point.
+        radius: Search radius in miles.
+        
+    Returns:
+        Tuple of (index of the selected station per check point or -1, its distance
+        in miles or inf). The distance is exact near the radius and approximate
+        elsewhere. Ties on price are broken by the shortest distance.
+    """
+    best_idx = np.full(check_lats.size, -1, dtype=np.int64)
+    best_dist = np.full(check_lats.size, np.inf)
+    
+    # Latitude band of every check point in the latitude-sorted stations
+    lo = np.searchsorted(lats, check_lats - buffer_degrees, side='left')
+    hi = np.searchsorted(lats, check_lats + buffer_degrees, side='right')
+    counts = hi - lo
+    if not counts.sum():
+        return best_idx, best_dist
+    
+    # Flatten the bands into (check point, station) pairs
+    owners = np.repeat(np.arange(check_lats.size), counts)
+    candidates = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    
+    # Keep the pairs within the longitude band, then within the radius
+    in_band = np.abs(lngs[candidates] - check_lngs[owners]) <= buffer_degrees
+    owners, candidates = owners[in_band], candidates[in_band]
+    distances = equirectangular_miles(check_lats[owners], check_lngs[owners], lats[candidates], lngs[candidates])
+    in_margin = distances <= radius * (1 + APPROXIMATION_MARGIN)
+    owners, candidates, distances = owners[in_margin], candidates[in_margin], distances[in_margin]
+    
+    # Re-measure the pairs near the radius, where the approximation could misplace them
+    near_edge = np.flatnonzero(distances >= radius * (1 - APPROXIMATION_MARGIN))
+    for i in near_edge.tolist():
+        distances[i] = geodesic(
+            (check_lats[owners[i]], check_lngs[owners[i]]),
+            (lats[candidates[i]], lngs[candidates[i]])
+        ).miles
+    in_radius = distances <= radius
+    owners, candidates, distances = owners[in_radius], candidates[in_radius], distances[in_radius]
+    
+    # Sort by check point, then price, then distance, and take the first pair of every check point
+    order = np.lexsort((distances, prices[candidates], owners))
+    owners, candidates, distances = owners[order], candidates[order], distances[order]
+    first = np.ones(owners.size, dtype=bool)
+    first[1:] = owners[1:] != owners[:-1]
+    best_idx[owners[first]] = candidates[first]
+    best_dist[owners[first]] = distances[first]
+    
+    return best_idx, best_dist
 
 class FuelOptimizer:
     """
@@ -31,37 +125,47 @@ class FuelOptimizer:
         self.search_radius = search_radius
         self.buffer_degrees = search_radius / 69  # Convert miles to approximate degrees (1 degree ≈ 69 miles)
     
-    def calculate_check_points(self, route_distance: float, steps: List[Dict[str, Any]], route_geometry: List[List[float]]) -> List[Tuple[float, float]]:
+    def calculate_check_points(self, route_distance: float, steps: List[Dict[str, Any]], route_geometry: np.ndarray) -> List[Tuple[float, float]]:
         """
         Calculate check points along the route where we should look for fuel stations.
         
         Args:
             route_distance: Total route distance in miles.
             steps: List of steps along the route.
-            route_geometry: List of coordinates along the route.
+            route_geometry: (N, 2) array of [lng, lat] coordinates along the route.
             
         Returns:
             List of check points as (latitude, longitude) tuples.
         """
-        check_points = []
-        cumulative_distance = 0
+        if not steps:
+            return []
+        
+        # Cumulative distance at the end of every step
+        distances = np.fromiter((step['distance'] for step in steps), dtype=np.float64, count=len(steps))
+        cumulative = distances.cumsum()
         
-        for step in steps:
-            cumulative_distance += step['distance']
-            if cumulative_distance >= self.segment_distance:
-                key_index = step['way_points'][-1]
-                check_points.append((route_geometry[key_index][1], route_geometry[key_index][0]))
-                cumulative_distance = 0
+        # Find the step where each segment ends; the distance count restarts from that step
+        boundary_steps = []
+        segment_start = 0.0
+        while True:
+            step_index = int(np.searchsorted(cumulative, segment_start + self.segment_distance, side='left'))
+            if step_index >= len(steps):
+                break
+            boundary_steps.append(step_index)
+            segment_start = cumulative[step_index]
         
         # Add a final check point if we've accumulated a significant distance
-        if cumulative_distance > self.segment_distance / 2 and steps:
-            last_step = steps[-1]
-            key_index = last_step['way_points'][-1]
-            check_points.append((route_geometry[key_index][1], route_geometry[key_index][0]))
+        if cumulative[-1] - segment_start > self.segment_distance / 2:
+            boundary_steps.append(len(steps) - 1)
+        
+        # Gather the (lat, lng) of every check point in one indexing step
+        key_indices = [steps[i]['way_points'][-1] for i in boundary_steps]
+        route_geometry = np.asarray(route_geometry, dtype=np.float64).reshape(-1, 2)
+        check_points = [tuple(point) for point in route_geometry[key_indices, ::-1].tolist()]
         
         return check_points
     
-    def find_stations_in_bounding_box(self, check_points: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    def find_stations_in_bounding_box(self, check_points: List[Tuple[float, float]]) -> Dict[str, Any]:
         """
         Find all stations within the bounding box of the check points.
         
@@ -69,45 +173,39 @@ class FuelOptimizer:
             check_points: List of check points as (latitude, longitude) tuples.
             
         Returns:
-            List of stations within the bounding box.
+            Dictionary with 'latitude', 'longitude', 'retail_price' and 'id' NumPy arrays,
+            all sorted by latitude.
         """
         if not check_points:
-            return []
+            return stations_to_arrays([])
         
         # Calculate the bounding box for all check points at once
-        check_lats = [point[0] for point in check_points]
-        check_lngs = [point[1] for point in check_points]
-        min_lat, max_lat = min(check_lats), max(check_lats)
-        min_lng, max_lng = min(check_lngs), max(check_lngs)
-        
-        # Create a cache key for this bounding box
-        cache_key = f"stations_bbox_{min_lat:.4f}_{min_lng:.4f}_{max_lat:.4f}_{max_lng:.4f}"
-        
-        # Try to get the stations from cache
-        cached_stations = cache.get(cache_key)
-        if cached_stations:
-            logger.info("Stations retrieved from cache")
-            return cached_stations
-        
-        # Get all stations within the bounding box in a single query
-        bounded_stations = list(FuelData.objects.filter(
-            latitude__range=(min_lat - self.buffer_degrees, max_lat + self.buffer_degrees),
-            longitude__range=(min_lng - self.buffer_degrees, max_lng + self.buffer_degrees)
-        ).values('id', 'truckstop_name', 'retail_price', 'latitude', 'longitude', 'city', 'state'))
-        
-        # Cache the stations
-        cache.set(cache_key, bounded_stations, CACHE_TIMEOUT)
-        
-        logger.info(f"Found {len(bounded_stations)} stations in bounding box")
+        check_array = np.asarray(check_points, dtype=np.float64)
+        min_lat, min_lng = check_array.min(axis=0).tolist()
+        max_lat, max_lng = check_array.max(axis=0).tolist()
+        
+        # Binary-search the latitude band in the latitude-sorted snapshot,
+        # then filter only that slab by longitude
+        snapshot = get_station_snapshot()
+        lo = np.searchsorted(snapshot['latitude'], min_lat - self.buffer_degrees, side='left')
+        hi = np.searchsorted(snapshot['latitude'], max_lat + self.buffer_degrees, side='right')
+        slab_lngs = snapshot['longitude'][lo:hi]
+        selected = lo + np.flatnonzero(
+            (slab_lngs >= min_lng - self.buffer_degrees) & (slab_lngs <= max_lng + self.buffer_degrees)
+        )
+        
+        bounded_stations = {name: values[selected] for name, values in snapshot.items()}
+        
+        logger.info(f"Found {selected.size} stations in bounding box")
         return bounded_stations
     
-    def find_nearest_cheapest_stations(self, check_points: List[Tuple[float, float]], bounded_stations: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], float]:
+    def find_nearest_cheapest_stations(self, check_points: List[Tuple[float, float]], bounded_stations: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float]:
         """
         Find the nearest and cheapest stations for each check point.
         
         Args:
             check_points: List of check points as (latitude, longitude) tuples.
-            bounded_stations: List of stations within the bounding box.
+            bounded_stations: Station arrays within the bounding box, as returned by find_stations_in_bounding_box.
             
         Returns:
             Tuple of (list of optimal fuel stops, total fuel cost).
@@ -115,58 +213,67 @@ class FuelOptimizer:
         fuel_stops = []
         total_cost = 0
         
-        for check_point in check_points:
-            logger.debug(f"Checking stations near point: {check_point}")
-            
-            # Filter stations by approximate distance first (faster than geodesic)
-            nearby_stations = []
-            check_lat, check_lng = check_point
-            
-            for station in bounded_stations:
-                # Quick rectangular distance check (much faster than geodesic)
-                lat_diff = abs(station['latitude'] - check_lat)
-                lng_diff = abs(station['longitude'] - check_lng)
-                
-                # If within rough bounds (slightly larger than actual radius)
-                if lat_diff <= self.buffer_degrees and lng_diff <= self.buffer_degrees:
-                    # Now do accurate geodesic calculation only for close stations
-                    distance = geodesic(check_point, (station['latitude'], station['longitude'])).miles
-                    if distance <= self.search_radius:
-                        nearby_stations.append((distance, float(station['retail_price']), station))
+        lats = bounded_stations['latitude']
+        lngs = bounded_stations['longitude']
+        prices = bounded_stations['retail_price']
+        station_ids = bounded_stations['id']
+        
+        # Select the cheapest station near every check point at once
+        check_array = np.asarray(check_points, dtype=np.float64).reshape(-1, 2)
+        best_idx, _ = cheapest_within_radius(
+            check_array[:, 0], check_array[:, 1], lats, lngs, prices,
+            self.buffer_degrees, self.search_radius
+        )
+        
+        # Convert the selected stations to Python values in one step per column,
+        # keyed by the index of their check point
+        found = best_idx >= 0
+        selected = best_idx[found]
+        selected_rows = dict(zip(
+            np.flatnonzero(found).tolist(),
+            zip(station_ids[selected].tolist(), lats[selected].tolist(), lngs[selected].tolist(), prices[selected].tolist())
+        ))
+        
+        # Fetch the display fields of the selected stations only
+        details = get_station_details(station_ids[selected].tolist())
+        fuel_per_segment = self.segment_distance / self.miles_per_gallon
+        
+        for i, check_point in enumerate(check_points):
+            row = selected_rows.get(i)
+            station = details.get(row[0]) if row else None
             
-            # Find the cheapest station if any were found
-            if nearby_stations:
-                # Sort by price first, then by distance if prices are equal
-                cheapest_stations = sorted(nearby_stations, key=lambda x: (x[1], x[0]))
-                distance, price, cheapest_station = cheapest_stations[0]
+            # Use the cheapest station if any was found
+            if station is not None:
+                _, lat, lng, price = row
                 
-                logger.debug(f"Selected cheapest: {cheapest_station['truckstop_name']} at ${price:.2f}")
+                logger.debug(f"Selected cheapest: {station['truckstop_name']} at ${price:.2f}")
                 
                 fuel_stops.append({
-                    'name': cheapest_station['truckstop_name'],
-                    'price': cheapest_station['retail_price'],
+                    'name': station['truckstop_name'],
+                    'price': price,
                     'location': {
-                        'lat': cheapest_station['latitude'],
-                        'lng': cheapest_station['longitude']
+                        'lat': lat,
+                        'lng': lng
                     },
-                    'city': cheapest_station['city'],
-                    'state': cheapest_station['state'],
-                    'distance_from_route': distance
+                    'city': station['city'],
+                    'state': station['state'],
+                    # Report the exact distance for the selected station
+                    'distance_from_route': geodesic(check_point, (lat, lng)).miles
                 })
-                total_cost += (self.segment_distance / self.miles_per_gallon) * price
+                total_cost += fuel_per_segment * price
             else:
                 logger.warning(f"No stations found within {self.search_radius} miles of {check_point}")
         
         return fuel_stops, total_cost
     
-    def optimize_fuel_stops(self, route_distance: float, steps: List[Dict[str, Any]], route_geometry: List[List[float]]) -> Tuple[List[Dict[str, Any]], float, List[Tuple[float, float]]]:
+    def optimize_fuel_stops(self, route_distance: float, steps: List[Dict[str, Any]], route_geometry: np.ndarray) -> Tuple[List[Dict[str, Any]], float, List[Tuple[float, float]]]:
         """
         Calculate optimal fuel stops along a route.
         
         Args:
             route_distance: Total route distance in miles.
             steps: List of steps along the route.
-            route_geometry: List of coordinates along the route.
+            route_geometry: (N, 2) array of [lng, lat] coordinates along the route.
             
         Returns:
             Tuple of (list of optimal fuel stops, total fuel cost, list of check points).
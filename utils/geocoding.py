@@ -2,8 +2,14 @@
 Geocoding utility functions for the route optimizer API.
 """
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from django.core.cache import cache
 from django.conf import settings
 
@@ -13,19 +19,108 @@ logger = logging.getLogger(__name__)
 # Cache timeout (7 days)
 CACHE_TIMEOUT = 60 * 60 * 24 * 7
 
+# Number of locations kept in the in-process cache, and how long they stay there (1 hour)
+LOCAL_CACHE_SIZE = 1024
+LOCAL_CACHE_TIMEOUT = 60 * 60
+
+class RateLimiter:
+    """
+    Enforce a minimum interval between calls, shared across threads.
+    """
+    def __init__(self, min_interval: float):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            min_interval: Minimum number of seconds between two calls.
+        """
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+    
+    def wait(self):
+        """
+        Block until the caller is allowed to make its call.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        
+        if delay > 0:
+            time.sleep(delay)
+
 class GeocodingService:
     """
     Service for geocoding location names to coordinates.
     """
-    def __init__(self):
+    def __init__(self, max_workers: int = 4, min_request_interval: float = 1.0):
         """
         Initialize the geocoding service.
+        
+        Args:
+            max_workers: Number of concurrent requests used by batch_geocode.
+            min_request_interval: Minimum seconds between requests (Nominatim allows 1 request per second).
         """
         # Using OpenStreetMap Nominatim API for geocoding
         self.api_url = "https://nominatim.openstreetmap.org/search"
+        self.max_workers = max_workers
+        self.min_request_interval = min_request_interval
+        
+        # Spaces out every request made through this service, across threads and batches
+        self._rate_limiter = RateLimiter(min_request_interval)
         self.headers = {
             "User-Agent": "RouteOptimizerAPI/1.0",
         }
+        
+        # Reuse connections (keep-alive) across geocoding requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+        
+        # In-process LRU cache in front of the Django cache, mapping cache keys to (coordinates, expiry time)
+        self._local_cache = OrderedDict()
+        self._local_cache_lock = threading.Lock()
+    
+    def _get_cached(self, cache_key: str) -> Optional[Dict[str, float]]:
+        """
+        Look up coordinates in the in-process cache, then in the Django cache.
+        
+        Args:
+            cache_key: Cache key of the location.
+            
+        Returns:
+            Dictionary with 'lat' and 'lng' keys, or None if the location is not cached.
+        """
+        with self._local_cache_lock:
+            entry = self._local_cache.get(cache_key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._local_cache.move_to_end(cache_key)
+                    return dict(entry[0])
+                del self._local_cache[cache_key]
+        
+        coordinates = cache.get(cache_key)
+        if coordinates:
+            self._set_local(cache_key, coordinates)
+        return coordinates
+    
+    def _set_cached(self, cache_key: str, coordinates: Dict[str, float]):
+        """
+        Store coordinates in both the Django cache and the in-process cache.
+        """
+        cache.set(cache_key, coordinates, CACHE_TIMEOUT)
+        self._set_local(cache_key, coordinates)
+    
+    def _set_local(self, cache_key: str, coordinates: Dict[str, float]):
+        """
+        Store coordinates in the in-process cache, evicting the least recently used entry when full.
+        """
+        with self._local_cache_lock:
+            self._local_cache[cache_key] = (dict(coordinates), time.monotonic() + LOCAL_CACHE_TIMEOUT)
+            self._local_cache.move_to_end(cache_key)
+            if len(self._local_cache) > LOCAL_CACHE_SIZE:
+                self._local_cache.popitem(last=False)
     
     def geocode(self, location_name: str, country_code: str = "us") -> Optional[Dict[str, float]]:
         """
@@ -42,10 +137,10 @@ class GeocodingService:
         location_name = location_name.strip()
         
         # Create a cache key
-        cache_key = f"geocode_{location_name}_{country_code}"
+        cache_key = self._cache_key(location_name, country_code)
         
         # Try to get the coordinates from cache
-        cached_coords = cache.get(cache_key)
+        cached_coords = self._get_cached(cache_key)
         if cached_coords:
             logger.info(f"Coordinates for '{location_name}' retrieved from cache")
             return cached_coords
@@ -60,8 +155,9 @@ class GeocodingService:
         }
         
         try:
-            # Make the API request
-            response = requests.get(self.api_url, params=params, headers=self.headers, timeout=5)
+            # Make the API request, respecting the request rate limit
+            self._rate_limiter.wait()
+            response = self.session.get(self.api_url, params=params, timeout=5)
             response.raise_for_status()
             
             # Parse the response
@@ -80,7 +176,7 @@ class GeocodingService:
             }
             
             # Cache the coordinates
-            cache.set(cache_key, coordinates, CACHE_TIMEOUT)
+            self._set_cached(cache_key, coordinates)
             
             logger.info(f"Successfully geocoded '{location_name}' to {coordinates}")
             return coordinates
@@ -89,21 +185,57 @@ class GeocodingService:
             logger.error(f"Error geocoding '{location_name}': {str(e)}")
             return None
     
-    def batch_geocode(self, locations: list) -> Dict[str, Dict[str, float]]:
+    @staticmethod
+    def _cache_key(location_name: str, country_code: str) -> str:
+        """
+        Build the cache key for a location name.
+        
+        Args:
+            location_name: Name of the location.
+            country_code: Country code used to limit results.
+            
+        Returns:
+            Cache key, case- and whitespace-insensitive so "New York, NY" and
+            "new  york,ny" share an entry.
+        """
+        normalized = re.sub(r"\s*,\s*", ",", location_name.strip().lower())
+        normalized = re.sub(r"\s+", "+", normalized)
+        return f"geocode_{normalized}_{country_code}"
+    
+    def batch_geocode(self, locations: list, country_code: str = "us") -> Dict[str, Dict[str, float]]:
         """
         Geocode multiple locations at once.
         
+        Cached locations are resolved first; the remaining ones are geocoded
+        concurrently, with requests spaced by min_request_interval through the
+        service's shared rate limiter.
+        
         Args:
             locations: List of location names to geocode.
+            country_code: Country code to limit results (default: "us").
             
         Returns:
             Dictionary mapping location names to coordinate dictionaries.
         """
-        results = {}
+        found = {}
+        uncached = []
         
-        for location in locations:
-            coords = self.geocode(location)
+        # Resolve cached locations without touching the network
+        for location in dict.fromkeys(locations):
+            coords = self._get_cached(self._cache_key(location, country_code))
             if coords:
-                results[location] = coords
+                found[location] = coords
+            else:
+                uncached.append(location)
+        
+        # Geocode the rest concurrently; geocode() spaces out the requests
+        if uncached:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self.geocode, location, country_code): location for location in uncached}
+                for future in as_completed(futures):
+                    coords = future.result()
+                    if coords:
+                        found[futures[future]] = coords
         
-        return results 
\ No newline at end of file
+        # Keep the results in the order the locations were given
+        return {location: found[location] for location in dict.fromkeys(locations) if location in found}
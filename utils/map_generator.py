@@ -2,15 +2,36 @@
 Map generator utility functions for the route optimizer API.
 """
 import os
+import gzip
 import uuid
+import hashlib
 import logging
 from typing import Dict, List, Tuple, Any
 import folium
+import numpy as np
+import orjson
+from branca.element import MacroElement
+from jinja2 import Template
 from django.conf import settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+class MapScript(MacroElement):
+    """
+    Prebuilt JavaScript rendered into the map's script block after the map is created.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        {{ this.code }}
+        {% endmacro %}
+    """)
+    
+    def __init__(self, code: str):
+        super().__init__()
+        self._name = 'MapScript'
+        self.code = code
+
 class MapGenerator:
     """
     Service for generating interactive maps.
@@ -25,11 +46,32 @@ class MapGenerator:
         self.map_dir = map_dir or os.path.join(settings.BASE_DIR, 'templates', 'maps')
         os.makedirs(self.map_dir, exist_ok=True)
     
+    @staticmethod
+    def _map_id(route_geometry: np.ndarray, fuel_stops: List[Dict[str, Any]],
+                checked_points: List[Tuple[float, float]], search_radius: float) -> str:
+        """
+        Derive the map ID from everything drawn on the map, so identical maps share one file.
+        """
+        digest = hashlib.blake2b(route_geometry.tobytes(), digest_size=16)
+        digest.update(orjson.dumps([fuel_stops, checked_points, search_radius], option=orjson.OPT_SERIALIZE_NUMPY))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _write_file(path: str, data: bytes, compress: bool = False):
+        """
+        Write a map file atomically so concurrent requests never see a partial file.
+        """
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with (gzip.open(tmp_path, 'wb', compresslevel=6) if compress else open(tmp_path, 'wb')) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
     def generate_map(self, 
                     geojson_data: Dict[str, Any], 
                     fuel_stops: List[Dict[str, Any]], 
                     checked_points: List[Tuple[float, float]],
-                    search_radius: float = 15.0) -> Tuple[str, str]:
+                    search_radius: float = 15.0,
+                    route_geometry: np.ndarray = None) -> Tuple[str, str]:
         """
         Generate an interactive map with the route, fuel stops, and check points.
         
@@ -38,20 +80,29 @@ class MapGenerator:
             fuel_stops: List of fuel stops.
             checked_points: List of check points.
             search_radius: Radius used to search for fuel stations in miles.
+            route_geometry: (N, 2) array of the route's [lng, lat] coordinates. If None, it is built from geojson_data.
             
         Returns:
             Tuple of (map_id, map_file_path).
         """
         # Extract coordinates from the GeoJSON response
-        coordinates = geojson_data['features'][0]['geometry']['coordinates']
-        first_coord = coordinates[0]
-        last_coord = coordinates[-1]
+        if route_geometry is None:
+            route_geometry = np.asarray(geojson_data['features'][0]['geometry']['coordinates'], dtype=np.float64).reshape(-1, 2)
+        first_coord = route_geometry[0].tolist()
+        last_coord = route_geometry[-1].tolist()
+        
+        # Reuse the map when the same route and fuel stops were already drawn
+        map_id = self._map_id(route_geometry, fuel_stops, checked_points, search_radius)
+        map_file = os.path.join(self.map_dir, f'{map_id}.html')
+        if os.path.exists(map_file):
+            logger.info(f"Reusing existing map {map_file}")
+            return map_id, map_file
         
         # Create a map centered on the first coordinate
         m = folium.Map(location=[first_coord[1], first_coord[0]], zoom_start=5)
         
         # Add the route as a PolyLine
-        folium.PolyLine([(lat, lon) for lon, lat in coordinates], color='blue', weight=2.5, opacity=1).add_to(m)
+        folium.PolyLine(route_geometry[:, ::-1].tolist(), color='blue', weight=2.5, opacity=1).add_to(m)
         
         # Add start marker
         folium.Marker(
@@ -67,45 +118,54 @@ class MapGenerator:
             icon=folium.Icon(color='red')
         ).add_to(m)
         
-        # Add markers for fuel stations
+        # Add the fuel stations as a single GeoJSON layer sharing one marker icon
+        fuel_stops_features = []
         for stop in fuel_stops:
             distance_info = f" ({stop['distance_from_route']:.1f} miles from route)" if 'distance_from_route' in stop else ""
             location_info = f"{stop['city']}, {stop['state']}" if 'city' in stop and 'state' in stop else ""
+            price_info = f"${stop['price']:.2f}"
             
             popup_content = f"""
             <b>{stop['name']}</b><br>
             {location_info}<br>
-            <b>Price:</b> ${float(stop['price']):.2f}{distance_info}
+            <b>Price:</b> {price_info}{distance_info}
             """
             
-            folium.Marker(
-                location=[stop['location']['lat'], stop['location']['lng']],
-                popup=folium.Popup(popup_content, max_width=200),
-                tooltip=f"{stop['name']} - ${float(stop['price']):.2f}",
-                icon=folium.Icon(color='orange', icon='tint')
-            ).add_to(m)
+            fuel_stops_features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [stop['location']['lng'], stop['location']['lat']]},
+                'properties': {
+                    'popup': popup_content,
+                    'tooltip': f"{stop['name']} - {price_info}"
+                }
+            })
         
-        # Add markers for checked points
-        for point in checked_points:
-            folium.CircleMarker(
-                location=point,
-                radius=5,
-                color='purple',
-                fill=True,
-                popup=f"Checked point: {point}",
-                opacity=0.7
-            ).add_to(m)
-            
-            # Draw a circle representing the search radius
-            folium.Circle(
-                location=point,
-                radius=search_radius * 1609.34,  # Convert miles to meters
-                color='purple',
-                fill=False,
-                opacity=0.3,
-                weight=1
+        # GeoJsonPopup and GeoJsonTooltip need at least one feature to render
+        if fuel_stops_features:
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': fuel_stops_features},
+                marker=folium.Marker(icon=folium.Icon(color='orange', icon='tint')),
+                popup=folium.GeoJsonPopup(fields=['popup'], labels=False, max_width=200),
+                tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False)
             ).add_to(m)
         
+        # Add the checked points and a circle representing their search radius,
+        # rendered as one prebuilt script instead of a folium object per point
+        map_name = m.get_name()
+        point_options = orjson.dumps({'radius': 5, 'color': 'purple', 'fill': True, 'opacity': 0.7}).decode()
+        radius_options = orjson.dumps({
+            'radius': search_radius * 1609.34,  # Convert miles to meters
+            'color': 'purple',
+            'fill': False,
+            'opacity': 0.3,
+            'weight': 1
+        }).decode()
+        MapScript("\n".join(
+            f"L.circleMarker([{lat}, {lng}], {point_options}).bindPopup({orjson.dumps(f'Checked point: {(lat, lng)}').decode()}).addTo({map_name});\n"
+            f"L.circle([{lat}, {lng}], {radius_options}).addTo({map_name});"
+            for lat, lng in checked_points
+        )).add_to(m)
+        
         # Add a legend
         legend_html = '''
         <div style="position: fixed; 
@@ -125,12 +185,13 @@ class MapGenerator:
         '''
         m.get_root().html.add_child(folium.Element(legend_html))
         
-        # Generate a unique ID for the map
-        map_id = str(uuid.uuid4())
+        # Save the map to an HTML file named by its content hash
+        html = m.get_root().render().encode('utf-8')
         
-        # Save the map to an HTML file with the random ID
-        map_file = os.path.join(self.map_dir, f'{map_id}.html')
-        m.save(map_file)
+        # Store a pre-compressed copy so the map can be served without compressing it per request.
+        # It is written first, so it is in place once the HTML file exists.
+        self._write_file(f'{map_file}.gz', html, compress=True)
+        self._write_file(map_file, html)
         
         logger.info(f"Map generated and saved to {map_file}")
         
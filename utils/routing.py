@@ -3,8 +3,12 @@ Routing utility functions for the route optimizer API.
 """
 import os
 import logging
+import threading
 from typing import Dict, List, Tuple, Any
-from openrouteservice import client
+import numpy as np
+import orjson
+from openrouteservice import client, exceptions
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from django.core.cache import cache
 
@@ -14,10 +18,38 @@ logger = logging.getLogger(__name__)
 # Cache timeout (24 hours)
 CACHE_TIMEOUT = 60 * 60 * 24
 
+# Decimal places used to round coordinates in cache keys (~11 m)
+CACHE_KEY_PRECISION = 4
+
+class ORJSONClient(client.Client):
+    """
+    OpenRouteService client that parses responses with orjson.
+    """
+    @staticmethod
+    def _get_body(response):
+        """
+        Return the body of a response, raising status code exceptions if necessary.
+        """
+        try:
+            body = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            raise exceptions.HTTPError(response.status_code)
+        
+        if response.status_code == 429:
+            raise exceptions._OverQueryLimit(response.status_code, body)
+        if response.status_code != 200:
+            raise exceptions.ApiError(response.status_code, body)
+        
+        return body
+
 class RoutingService:
     """
     Service for handling routing calculations using OpenRouteService.
     """
+    # OpenRouteService clients shared by all instances, keyed by API key
+    _clients: Dict[str, ORJSONClient] = {}
+    _clients_lock = threading.Lock()
+    
     def __init__(self, api_key: str = None):
         """
         Initialize the routing service with the API key.
@@ -26,7 +58,28 @@ class RoutingService:
             api_key: OpenRouteService API key. If None, uses the key from settings.
         """
         self.api_key = api_key or settings.OPENROUTE_API_KEY
-        self.client = client.Client(key=self.api_key)
+        self.client = self._get_client(self.api_key)
+    
+    @classmethod
+    def _get_client(cls, api_key: str) -> ORJSONClient:
+        """
+        Get the OpenRouteService client for an API key, creating it on first use.
+        
+        The client's HTTP session is shared across requests, so connections to
+        the API are kept alive instead of being opened for every route.
+        
+        Args:
+            api_key: OpenRouteService API key.
+            
+        Returns:
+            The shared OpenRouteService client.
+        """
+        with cls._clients_lock:
+            if api_key not in cls._clients:
+                ors_client = ORJSONClient(key=api_key)
+                ors_client._session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=50))
+                cls._clients[api_key] = ors_client
+            return cls._clients[api_key]
     
     def get_route(self, start: Dict[str, float], finish: Dict[str, float]) -> Dict[str, Any]:
         """
@@ -42,14 +95,15 @@ class RoutingService:
         Raises:
             ValueError: If the route cannot be calculated.
         """
-        # Create a cache key based on the start and finish coordinates
-        cache_key = f"route_{start['lat']}_{start['lng']}_{finish['lat']}_{finish['lng']}"
+        # Create a cache key based on the rounded start and finish coordinates
+        cache_key = self._cache_key(start, finish)
         
         # Try to get the route from cache
+        # Routes are cached as JSON bytes, which are much cheaper to store and load than the pickled response
         cached_route = cache.get(cache_key)
         if cached_route:
             logger.info("Route retrieved from cache")
-            return cached_route
+            return orjson.loads(cached_route)
         
         # Prepare the request payload
         payload = {
@@ -70,13 +124,34 @@ class RoutingService:
                 raise ValueError("Failed to fetch route data")
             
             # Cache the response
-            cache.set(cache_key, response, CACHE_TIMEOUT)
+            cache.set(cache_key, orjson.dumps(response), CACHE_TIMEOUT)
             
             return response
         except Exception as e:
             logger.error(f"Error fetching route: {str(e)}")
             raise ValueError(f"Failed to fetch route data: {str(e)}")
     
+    @staticmethod
+    def _cache_key(start: Dict[str, float], finish: Dict[str, float]) -> str:
+        """
+        Build the cache key for a route.
+        
+        Coordinates are rounded to CACHE_KEY_PRECISION decimal places so that
+        near-identical start and finish points share a cache entry.
+        
+        Args:
+            start: Dictionary with 'lat' and 'lng' keys for the starting point.
+            finish: Dictionary with 'lat' and 'lng' keys for the ending point.
+            
+        Returns:
+            Cache key for the route.
+        """
+        rounded = (
+            round(float(value), CACHE_KEY_PRECISION) + 0.0  # + 0.0 turns -0.0 into 0.0
+            for value in (start['lat'], start['lng'], finish['lat'], finish['lng'])
+        )
+        return "route_" + "_".join(f"{value}" for value in rounded)
+    
     def extract_route_info(self, route_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Extract useful information from the route data.
@@ -106,7 +181,9 @@ class RoutingService:
                 'distance': distance,
                 'duration': duration,
                 'steps': steps,
-                'coordinates': coordinates
+                'coordinates': coordinates,
+                # (N, 2) array of the same [lng, lat] coordinates, shared by the fuel optimizer and the map
+                'coordinate_array': np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
             }
         except (KeyError, IndexError) as e:
             logger.error(f"Error extracting route info: {str(e)}")